@@ -1,13 +1,17 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
+import io
 import json
 import os
 import pathlib
 import re
 import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 
 from sec_http import fetch_bytes as fetch_sec_bytes
+from sec_http import fetch_cached as fetch_sec_cached
 
 USER_AGENT = os.environ.get(
     "SEC_USER_AGENT",
@@ -16,6 +20,10 @@ USER_AGENT = os.environ.get(
 BASE_DIR = pathlib.Path(__file__).resolve().parents[1]
 DATA_PATH = BASE_DIR / "data" / "sec-13f-history.json"
 SEC_TICKERS_URL = "https://www.sec.gov/files/company_tickers_exchange.json"
+SHARE_FETCH_WORKERS = 4
+PROGRESS_EVERY_FILINGS = 100
+SEC_CACHE_DIR = BASE_DIR / ".cache" / "sec"
+SEC_CACHE_ENABLED = os.environ.get("SEC_HTTP_CACHE", "1").strip() != "0"
 
 MANUAL_CODE_TICKERS = {
     "060505104": "BAC",
@@ -153,6 +161,21 @@ TOKEN_REPLACEMENTS = {
     "CTLS": "CONTROLS",
 }
 
+_ISSUER_PARENS_RE = re.compile(r"\([^)]*\)")
+# "&" is spelled out and separator punctuation becomes whitespace in a single
+# str.translate pass; str.split() then collapses the resulting runs.
+_ISSUER_CHAR_MAP = str.maketrans({"&": " AND ", "/": " ", ".": " ", ",": " ", "-": " "})
+# One lookup per token: the replacement spelling, or None for a stopword.
+_ISSUER_TOKEN_MAP: dict[str, str | None] = {
+    **dict.fromkeys(STOPWORDS - TOKEN_REPLACEMENTS.keys()),
+    **{
+        token: (None if replacement in STOPWORDS else replacement)
+        for token, replacement in TOKEN_REPLACEMENTS.items()
+    },
+}
+_TICKER_RE = re.compile(r"[A-Z][A-Z0-9.\-]{0,6}")
+_MANUAL_ISSUER_KEYWORD_RE = re.compile("|".join(map(re.escape, MANUAL_ISSUER_KEYWORDS)))
+
 EXCHANGE_PRIORITY = {
     "NYSE": 0,
     "Nasdaq": 1,
@@ -176,103 +199,138 @@ def fetch_bytes(url: str) -> bytes:
     )
 
 
-def normalize_issuer_name(value: str) -> str:
-    text = value.upper().replace("&", " AND ")
-    text = re.sub(r"\([^)]*\)", " ", text)
-    text = re.sub(r"[/.,\-]+", " ", text)
-    text = re.sub(r"\s+", " ", text).strip()
-    tokens = []
-    for token in text.split():
-        token = TOKEN_REPLACEMENTS.get(token, token)
-        if token in STOPWORDS:
-            continue
-        tokens.append(token)
-    return " ".join(tokens)
+def fetch_cached_bytes(url: str, *, immutable: bool = False, refresh: bool = False) -> bytes:
+    if not SEC_CACHE_ENABLED:
+        return fetch_bytes(url)
+    return fetch_sec_cached(
+        url,
+        cache_dir=SEC_CACHE_DIR,
+        immutable=immutable,
+        refresh=refresh,
+        user_agent=USER_AGENT,
+        timeout=75,
+        max_attempts=5,
+        min_interval_seconds=0.7,
+        success_pause_seconds=0.2,
+        logger=print,
+    )
+
+
+@lru_cache(maxsize=200_000)
+def normalize_issuer_name(value: str | None) -> str:
+    if not value:
+        return ""
+    text = _ISSUER_PARENS_RE.sub(" ", value.upper()).translate(_ISSUER_CHAR_MAP)
+    tokens = (_ISSUER_TOKEN_MAP.get(token, token) for token in text.split())
+    return " ".join(token for token in tokens if token is not None)
 
 
+@lru_cache(maxsize=4096)
 def looks_like_ticker(value: str) -> bool:
     text = (value or "").strip().upper()
     if not text:
         return False
-    if re.fullmatch(r"[A-Z][A-Z0-9.\-]{0,6}", text):
-        return True
-    return False
-
-
-def parse_float(text: str) -> float:
-    if not text:
-        return 0.0
-    clean = text.replace(",", "").strip()
-    if not clean:
-        return 0.0
-    return float(clean)
+    return _TICKER_RE.fullmatch(text) is not None
 
 
 def parse_info_table_shares(xml_bytes: bytes) -> dict[str, float]:
-    root = ET.fromstring(xml_bytes)
+    events = ET.iterparse(io.BytesIO(xml_bytes), events=("start", "end"))
+    _, root = next(events)
     if not root.tag.lower().endswith("informationtable"):
+        # Finish the parse so malformed documents still raise ParseError.
+        for _ in events:
+            pass
         return {}
 
     ns = ""
     if root.tag.startswith("{"):
         ns = root.tag.split("}")[0] + "}"
 
+    tag_info_table = f"{ns}infoTable"
+    tag_issuer = f"{ns}nameOfIssuer"
+    tag_cusip = f"{ns}cusip"
+    tag_amount = f"{ns}shrsOrPrnAmt"
+    tag_shares = f"{ns}sshPrnamt"
+
     result: dict[str, float] = {}
-    for item in root.findall(f"{ns}infoTable"):
-        issuer = (item.findtext(f"{ns}nameOfIssuer") or "").strip()
-        cusip = (item.findtext(f"{ns}cusip") or "").strip()
-        code = cusip or issuer
-        if not code:
+    # Only direct children of the root are rows, as with root.findall().
+    depth = 1
+    for event, item in events:
+        if event == "start":
+            depth += 1
             continue
-
-        shares_node = item.find(f"{ns}shrsOrPrnAmt")
-        if shares_node is None:
+        depth -= 1
+        if depth != 1 or item.tag != tag_info_table:
             continue
-        shares_text = (shares_node.findtext(f"{ns}sshPrnamt") or "").strip()
-        if not shares_text:
+        issuer = (item.findtext(tag_issuer) or "").strip()
+        cusip = (item.findtext(tag_cusip) or "").strip()
+        # Two single-tag lookups stay in C; an "a/b" path goes through ElementPath.
+        amount = item.find(tag_amount)
+        shares_text = ((amount.findtext(tag_shares) if amount is not None else None) or "").strip()
+        # Drop finished rows so only the current infoTable stays resident.
+        root.clear()
+
+        code = cusip or issuer
+        if not code or not shares_text:
             continue
+        # sshPrnamt is an integer count per the 13F schema; only fall back to
+        # float parsing for the odd filing that reports fractional amounts.
+        clean = shares_text.replace(",", "")
         try:
-            shares = parse_float(shares_text)
+            shares = int(clean)
         except ValueError:
-            continue
+            try:
+                shares = float(clean)
+            except ValueError:
+                continue
         result[code] = result.get(code, 0.0) + shares
     return result
 
 
-def choose_best_tickers() -> dict[str, str]:
-    payload = json.loads(fetch_bytes(SEC_TICKERS_URL))
-    best_by_name: dict[str, tuple[tuple[int, int, str], str]] = {}
+def rank_sec_tickers(payload: dict) -> dict[str, str]:
+    buckets: dict[int, list[tuple[str, str]]] = {}
     for row in payload.get("data", []):
         if len(row) < 4:
             continue
         _, name, ticker, exchange = row
         if not ticker:
             continue
-        normalized = normalize_issuer_name(name or "")
-        if not normalized:
-            continue
-        candidate = (EXCHANGE_PRIORITY.get(exchange, 8), len(ticker), ticker)
-        current = best_by_name.get(normalized)
-        if current is None or candidate < current[0]:
-            best_by_name[normalized] = (candidate, ticker.replace(".", "-"))
-    return {name: value[1] for name, value in best_by_name.items()}
+        buckets.setdefault(EXCHANGE_PRIORITY.get(exchange, 8), []).append((ticker, name))
+
+    # Walk rows best-first (exchange priority, shorter ticker, ticker) so the
+    # first ticker stored for a normalized name is the preferred one.
+    best_by_name: dict[str, str] = {}
+    for priority in sorted(buckets):
+        rows = buckets[priority]
+        rows.sort(key=lambda item: (len(item[0]), item[0]))
+        for ticker, name in rows:
+            normalized = normalize_issuer_name(name)
+            if normalized:
+                best_by_name.setdefault(normalized, ticker.replace(".", "-"))
+    return best_by_name
 
 
-def resolve_ticker(code: str, issuer: str, by_name: dict[str, str]) -> str:
-    cleaned_code = (code or "").strip().upper()
-    normalized_issuer = normalize_issuer_name(issuer or "")
+def choose_best_tickers() -> dict[str, str]:
+    # The raw file is revalidated with a conditional GET through .cache/sec;
+    # ranking it again is cheap next to the download.
+    return rank_sec_tickers(json.loads(fetch_cached_bytes(SEC_TICKERS_URL)))
+
 
+def resolve_ticker(cleaned_code: str, issuer: str, by_name: dict[str, str]) -> str:
+    # cleaned_code must already be stripped and uppercased by the caller.
     if cleaned_code in MANUAL_CODE_TICKERS:
         return MANUAL_CODE_TICKERS[cleaned_code]
 
     if looks_like_ticker(cleaned_code):
         return cleaned_code.replace(".", "-")
 
-    for keyword, ticker in MANUAL_ISSUER_KEYWORDS.items():
-        if keyword in normalized_issuer:
-            return ticker
+    normalized_issuer = normalize_issuer_name(issuer)
 
-    first_token = normalized_issuer.split(" ", 1)[0] if normalized_issuer else ""
+    keyword_match = _MANUAL_ISSUER_KEYWORD_RE.search(normalized_issuer)
+    if keyword_match:
+        return MANUAL_ISSUER_KEYWORDS[keyword_match.group(0)]
+
+    first_token, _, _ = normalized_issuer.partition(" ")
     if first_token in GENERIC_PREFIXES:
         return ""
 
@@ -290,8 +348,12 @@ def build_cached_ticker_map(payload: dict) -> dict[str, str]:
     for manager in payload.get("managers", []):
         for filing in manager.get("filings", []):
             for holding in filing.get("holdings", []):
-                ticker = (holding.get("ticker") or "").strip().upper().replace(".", "-")
-                issuer = (holding.get("issuer") or "").strip()
+                raw_ticker = holding.get("ticker")
+                raw_issuer = holding.get("issuer")
+                if not raw_ticker or not raw_issuer:
+                    continue
+                ticker = normalize_ticker(raw_ticker)
+                issuer = raw_issuer.strip()
                 if not ticker or not issuer:
                     continue
                 normalized_issuer = normalize_issuer_name(issuer)
@@ -305,9 +367,10 @@ def normalize_ticker(value: str) -> str:
     return (value or "").strip().upper().replace(".", "-")
 
 
-def filing_needs_ticker_update(filing: dict) -> bool:
-    for holding in filing.get("holdings", []):
-        if not normalize_ticker(holding.get("ticker") or ""):
+def holdings_need_ticker_update(holdings: list[dict]) -> bool:
+    for holding in holdings:
+        ticker = holding.get("ticker")
+        if not ticker or not ticker.strip():
             return True
     return False
 
@@ -345,16 +408,23 @@ def holding_shares_count(holding: dict) -> float:
         return 0.0
 
 
-def is_legacy_noise_holding(holding: dict, filing_total_value: float) -> bool:
+def legacy_noise_code(holding: dict) -> str:
+    # Only digit-free codes (words lifted from legacy text filings) can be noise.
     code = str(holding.get("code") or "").strip().upper()
+    if any(ch.isdigit() for ch in code):
+        return ""
+    return code
+
+
+def is_legacy_noise_holding(holding: dict, filing_total_value: float) -> bool:
+    code = legacy_noise_code(holding)
     if not code:
         return False
 
-    has_digit = any(ch.isdigit() for ch in code)
     value = holding_value_usd(holding)
     shares = holding_shares_count(holding)
 
-    if code in LEGACY_NOISE_CODES and not has_digit:
+    if code in LEGACY_NOISE_CODES:
         if value <= 1000:
             return True
         if shares >= 1900 and shares <= 2105:
@@ -362,7 +432,7 @@ def is_legacy_noise_holding(holding: dict, filing_total_value: float) -> bool:
         if filing_total_value > 0 and value >= filing_total_value * 0.9:
             return True
 
-    if not has_digit and len(code) >= 7 and filing_total_value > 0 and value >= filing_total_value * 0.9 and shares > 0:
+    if len(code) >= 7 and filing_total_value > 0 and value >= filing_total_value * 0.9 and shares > 0:
         implied_value_per_share = value / shares
         if implied_value_per_share > 100000:
             return True
@@ -370,49 +440,85 @@ def is_legacy_noise_holding(holding: dict, filing_total_value: float) -> bool:
     return False
 
 
-def filing_needs_sanitization(filing: dict) -> bool:
-    holdings = filing.get("holdings", [])
-    if not isinstance(holdings, list) or not holdings:
-        return False
-    filing_total = sum(holding_value_usd(holding) for holding in holdings)
-    return any(is_legacy_noise_holding(holding, filing_total) for holding in holdings)
+def assess_filing_holdings(holdings: list[dict]) -> tuple[bool, bool, float]:
+    needs_ticker_update = False
+    may_have_noise = False
+    filing_total = 0.0
+    for holding in holdings:
+        filing_total += holding_value_usd(holding)
+        if not needs_ticker_update:
+            ticker = holding.get("ticker")
+            needs_ticker_update = not ticker or not ticker.strip()
+        if not may_have_noise:
+            may_have_noise = bool(legacy_noise_code(holding))
+    return needs_ticker_update, may_have_noise, filing_total
 
 
-def sanitize_filing_holdings(filing: dict) -> int:
+def sanitize_filing_holdings(filing: dict, filing_total: float | None = None) -> int:
     holdings = filing.get("holdings", [])
     if not isinstance(holdings, list) or not holdings:
         return 0
 
-    filing_total = sum(holding_value_usd(holding) for holding in holdings)
-    sanitized: list[dict] = []
-    removed = 0
-    for holding in holdings:
+    values = [holding_value_usd(holding) for holding in holdings]
+    if filing_total is None:
+        filing_total = sum(values)
+    kept: list[tuple[dict, float]] = []
+    total_value = 0.0
+    for holding, value in zip(holdings, values):
         if is_legacy_noise_holding(holding, filing_total):
-            removed += 1
             continue
-        sanitized.append(holding)
+        kept.append((holding, value))
+        total_value += value
 
+    removed = len(holdings) - len(kept)
     if removed == 0:
         return 0
 
-    total_value = sum(holding_value_usd(holding) for holding in sanitized)
-    for holding in sanitized:
-        value = holding_value_usd(holding)
+    for holding, value in kept:
         holding["weight"] = (value / total_value) if total_value > 0 else 0
 
-    filing["holdings"] = sanitized
-    filing["holdings_count"] = len(sanitized)
+    filing["holdings"] = [holding for holding, _ in kept]
+    filing["holdings_count"] = len(kept)
     filing["total_value_usd"] = int(round(total_value))
     return removed
 
 
+def fetch_info_table_bytes(url: str) -> bytes:
+    # Only used under REFRESH_SHARES_FROM_SEC=1, which promises a re-fetch:
+    # skip any cached copy, but still store the fresh body for later runs.
+    return fetch_cached_bytes(url, immutable=True, refresh=True)
+
+
+def fetch_info_table_shares(url: str) -> dict[str, float]:
+    return parse_info_table_shares(fetch_info_table_bytes(url))
+
+
+def prefetch_info_table_shares(urls: list[str]) -> dict[str, dict[str, float] | Exception]:
+    # Downloads overlap across workers; sec_http's shared throttle still
+    # spaces request starts, so the SEC request rate is unchanged.
+    results: dict[str, dict[str, float] | Exception] = {}
+    unique_urls = list(dict.fromkeys(urls))
+    with ThreadPoolExecutor(max_workers=SHARE_FETCH_WORKERS) as executor:
+        futures = {executor.submit(fetch_info_table_shares, url): url for url in unique_urls}
+        for future in as_completed(futures):
+            url = futures[future]
+            try:
+                results[url] = future.result()
+            except Exception as exc:
+                results[url] = exc
+    return results
+
+
 def main() -> None:
     refresh_shares = os.environ.get("REFRESH_SHARES_FROM_SEC", "").strip() == "1"
     original_text = DATA_PATH.read_text(encoding="utf-8")
     payload = json.loads(original_text)
+    # Set wherever the payload is mutated; re-serializing the whole history
+    # with indent=2 is only worth it when something actually changed.
+    changed = False
 
     needs_ticker_updates = any(
-        filing_needs_ticker_update(filing)
+        holdings_need_ticker_update(filing.get("holdings", []))
         for manager in payload.get("managers", [])
         for filing in manager.get("filings", [])
     )
@@ -429,6 +535,16 @@ def main() -> None:
     else:
         print(f"[info] no missing tickers detected; using cached ticker map only ({len(cached_tickers)})")
 
+    prefetched_shares: dict[str, dict[str, float] | Exception] = {}
+    if refresh_shares:
+        info_table_urls = [
+            filing.get("info_table_url")
+            for manager in payload.get("managers", [])
+            for filing in manager.get("filings", [])
+            if filing.get("info_table_url")
+        ]
+        prefetched_shares = prefetch_info_table_shares(info_table_urls)
+
     total_filings = sum(len(m.get("filings", [])) for m in payload.get("managers", []))
     filing_counter = 0
     processed_filings = 0
@@ -445,62 +561,80 @@ def main() -> None:
             filing_counter += 1
             quarter = filing.get("quarter")
             info_table_url = filing.get("info_table_url", "")
-            needs_ticker_update = filing_needs_ticker_update(filing)
+            holdings = filing.get("holdings", [])
+            needs_ticker_update, may_have_noise, filing_total = assess_filing_holdings(holdings)
+            removed_noise_rows = 0
+            if may_have_noise:
+                removed_noise_rows = sanitize_filing_holdings(filing, filing_total)
+                holdings = filing.get("holdings", [])
             needs_share_refresh = refresh_shares and bool(info_table_url)
-            needs_sanitization = filing_needs_sanitization(filing)
+            # Report progress before the fast path so skipped filings count too;
+            # the rest of the loop never changes the number of holdings.
+            if filing_counter % PROGRESS_EVERY_FILINGS == 0 or filing_counter == total_filings:
+                print(f"[{filing_counter}/{total_filings}] {manager_id} {quarter} holdings={len(holdings)}")
 
-            if not needs_ticker_update and not needs_share_refresh and not needs_sanitization:
+            if not needs_ticker_update and not needs_share_refresh and not removed_noise_rows:
                 skipped_unchanged_filings += 1
                 continue
 
             processed_filings += 1
-            removed_noise_rows = sanitize_filing_holdings(filing)
             if removed_noise_rows:
                 sanitized_rows_removed += removed_noise_rows
+                changed = True
 
             shares_by_code: dict[str, float] = {}
             if needs_share_refresh:
-                try:
-                    xml_bytes = fetch_bytes(info_table_url)
-                    shares_by_code = parse_info_table_shares(xml_bytes)
+                outcome = prefetched_shares.get(info_table_url)
+                if isinstance(outcome, dict):
+                    shares_by_code = outcome
                     share_success += 1
-                except Exception as exc:
+                else:
                     share_failed += 1
-                    print(f"[warn] shares fetch failed {manager_id} {quarter}: {exc}")
+                    print(f"[warn] shares fetch failed {manager_id} {quarter}: {outcome}")
             elif not refresh_shares:
                 share_skipped += 1
 
-            for holding in filing.get("holdings", []):
-                code = (holding.get("code") or "").strip()
-                issuer = (holding.get("issuer") or "").strip()
+            for holding in holdings:
+                raw_code = holding.get("code")
+                code = raw_code.strip() if raw_code else ""
                 if code in shares_by_code:
                     next_shares = normalize_shares_number(shares_by_code[code])
                     if holding.get("shares") != next_shares:
                         holding["shares"] = next_shares
+                        changed = True
                 elif "shares" not in holding:
                     holding["shares"] = None
+                    changed = True
 
-                existing_ticker = normalize_ticker(holding.get("ticker") or "")
+                raw_ticker = holding.get("ticker")
+                existing_ticker = normalize_ticker(raw_ticker) if raw_ticker else ""
                 if existing_ticker:
-                    if holding.get("ticker") != existing_ticker:
+                    if raw_ticker != existing_ticker:
                         holding["ticker"] = existing_ticker
+                        changed = True
                     continue
 
-                ticker = normalize_ticker(resolve_ticker(code, issuer, by_name))
+                raw_issuer = holding.get("issuer")
+                issuer = raw_issuer.strip() if raw_issuer else ""
+                ticker = normalize_ticker(resolve_ticker(code.upper(), issuer, by_name))
                 if ticker:
+                    if raw_ticker != ticker:
+                        changed = True
                     holding["ticker"] = ticker
                     ticker_updates += 1
                 elif "ticker" in holding:
                     holding.pop("ticker", None)
+                    changed = True
 
-            print(f"[{filing_counter}/{total_filings}] {manager_id} {quarter} holdings={len(filing.get('holdings', []))}")
-
+    if "generated_at_utc" not in payload:
+        changed = True
     payload["generated_at_utc"] = payload.get("generated_at_utc")
     ticker_mapping_note = (
         "Ticker resolved from SEC company_tickers_exchange.json when available, plus local overrides and cached fallback."
     )
     if payload.get("ticker_mapping_note") != ticker_mapping_note:
         payload["ticker_mapping_note"] = ticker_mapping_note
+        changed = True
 
     if refresh_shares:
         shares_note = "shares refreshed from infoTable shrsOrPrnAmt/sshPrnamt when fetch succeeds."
@@ -508,8 +642,11 @@ def main() -> None:
         shares_note = "shares reused from history dataset; set REFRESH_SHARES_FROM_SEC=1 to force SEC re-fetch."
     if payload.get("shares_note") != shares_note:
         payload["shares_note"] = shares_note
+        changed = True
 
-    output_text = json.dumps(payload, ensure_ascii=False, indent=2)
+    output_text = original_text
+    if changed:
+        output_text = json.dumps(payload, ensure_ascii=False, indent=2)
     if output_text != original_text:
         DATA_PATH.write_text(output_text, encoding="utf-8")
         print(f"Wrote {DATA_PATH}")
@@ -9,13 +9,20 @@ Usage:
 from __future__ import annotations
 
 import datetime as dt
+import io
+import itertools
 import json
 import os
 import pathlib
 import re
 import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from operator import itemgetter
 
 from sec_http import fetch_bytes as fetch_sec_bytes
+from sec_http import fetch_cached as fetch_sec_cached
+from sec_http import write_atomic
 
 USER_AGENT = os.environ.get(
     "SEC_USER_AGENT",
@@ -23,8 +30,16 @@ USER_AGENT = os.environ.get(
 )
 BASE_DIR = pathlib.Path(__file__).resolve().parents[1]
 OUTPUT_PATH = BASE_DIR / "data" / "sec-13f-history.json"
+SEC_CACHE_DIR = BASE_DIR / ".cache" / "sec"
+SEC_CACHE_ENABLED = os.environ.get("SEC_HTTP_CACHE", "1").strip() != "0"
+HOLDINGS_CACHE_DIR = BASE_DIR / ".cache" / "holdings"
+# Bump when the info-table parsers change so stale parses are ignored.
+HOLDINGS_CACHE_VERSION = 1
+FORCE_REFRESH = os.environ.get("FORCE_REFRESH", "").strip() == "1"
 
 MIN_REPORT_DATE = dt.date(1999, 1, 1)
+THIRTEEN_F_FORMS = frozenset(("13F-HR", "13F-HR/A"))
+FILING_FETCH_WORKERS = 4
 
 MANAGERS = [
     {
@@ -126,12 +141,14 @@ MANAGERS = [
 ]
 
 
+@lru_cache(maxsize=8192)
 def quarter_from_date(date_str: str) -> str:
     year, month, _ = map(int, date_str.split("-"))
     q = ((month - 1) // 3) + 1
     return f"{year}Q{q}"
 
 
+@lru_cache(maxsize=8192)
 def estimate_report_date_from_filing(filing_date: str) -> str:
     if not filing_date:
         return ""
@@ -146,6 +163,21 @@ def estimate_report_date_from_filing(filing_date: str) -> str:
 
 
 def fetch_bytes(url: str) -> bytes:
+    if SEC_CACHE_ENABLED:
+        # Filed accessions under Archives/ never change once published.
+        return fetch_sec_cached(
+            url,
+            cache_dir=SEC_CACHE_DIR,
+            immutable="/Archives/edgar/data/" in url,
+            # FORCE_REFRESH must not re-parse a bad body served from disk.
+            refresh=FORCE_REFRESH,
+            user_agent=USER_AGENT,
+            timeout=75,
+            max_attempts=5,
+            min_interval_seconds=0.8,
+            success_pause_seconds=0.25,
+            logger=print,
+        )
     return fetch_sec_bytes(
         url,
         user_agent=USER_AGENT,
@@ -161,24 +193,35 @@ def fetch_json(url: str) -> dict:
     return json.loads(fetch_bytes(url))
 
 
-def submission_rows(submission_obj: dict) -> list[dict]:
+def collect_submission_rows(submission_obj: dict, rows_by_accession: dict[str, dict]) -> None:
     if "filings" in submission_obj and isinstance(submission_obj.get("filings"), dict):
         recent = submission_obj.get("filings", {}).get("recent", {})
     else:
         recent = submission_obj
-    forms = recent.get("form", [])
-    rows: list[dict] = []
-    for i, form in enumerate(forms):
-        rows.append(
-            {
-                "form": form or "",
-                "accession": recent.get("accessionNumber", [""])[i] or "",
-                "filing_date": recent.get("filingDate", [""])[i] or "",
-                "report_date": recent.get("reportDate", [""])[i] or "",
-                "primary_doc": recent.get("primaryDocument", [""])[i] or "",
-            }
-        )
-    return rows
+    forms = recent.get("form") or []
+    columns = itertools.zip_longest(
+        forms,
+        recent.get("accessionNumber") or [],
+        recent.get("filingDate") or [],
+        recent.get("reportDate") or [],
+        recent.get("primaryDocument") or [],
+        fillvalue="",
+    )
+    for form, accession, filing_date, report_date, primary_doc in itertools.islice(columns, len(forms)):
+        if not accession:
+            continue
+        # Later pages overwrite earlier rows for the same accession. Other
+        # forms are never selected, so only their overwrite is honoured.
+        if form not in THIRTEEN_F_FORMS:
+            rows_by_accession.pop(accession, None)
+            continue
+        rows_by_accession[accession] = {
+            "form": form or "",
+            "accession": accession,
+            "filing_date": filing_date or "",
+            "report_date": report_date or "",
+            "primary_doc": primary_doc or "",
+        }
 
 
 def load_submission_rows(cik: int, *, include_archives: bool) -> tuple[str, list[dict]]:
@@ -187,23 +230,21 @@ def load_submission_rows(cik: int, *, include_archives: bool) -> tuple[str, list
     base_obj = fetch_json(base_url)
     entity_name = base_obj.get("name", "")
 
-    rows = submission_rows(base_obj)
+    rows_by_accession: dict[str, dict] = {}
+    collect_submission_rows(base_obj, rows_by_accession)
     if include_archives:
-        for file_meta in base_obj.get("filings", {}).get("files", []):
-            name = file_meta.get("name")
-            if not name:
-                continue
-            extra_url = f"https://data.sec.gov/submissions/{name}"
-            extra_obj = fetch_json(extra_url)
-            rows.extend(submission_rows(extra_obj))
-
-    dedup = {}
-    for row in rows:
-        acc = row["accession"]
-        if acc:
-            dedup[acc] = row
+        extra_urls = [
+            f"https://data.sec.gov/submissions/{file_meta['name']}"
+            for file_meta in base_obj.get("filings", {}).get("files", [])
+            if file_meta.get("name")
+        ]
+        # map() yields in submission order, so later archives still win the
+        # accession dedup exactly as with sequential fetches.
+        with ThreadPoolExecutor(max_workers=FILING_FETCH_WORKERS) as executor:
+            for extra_obj in executor.map(fetch_json, extra_urls):
+                collect_submission_rows(extra_obj, rows_by_accession)
 
-    return entity_name, list(dedup.values())
+    return entity_name, list(rows_by_accession.values())
 
 
 def load_all_submission_rows(cik: int) -> tuple[str, list[dict]]:
@@ -215,11 +256,9 @@ def load_recent_submission_rows(cik: int) -> tuple[str, list[dict]]:
 
 
 def choose_quarter_filings(rows: list[dict]) -> list[dict]:
+    # collect_submission_rows has already dropped non-13F forms.
     selected: list[dict] = []
     for row in rows:
-        form = row["form"]
-        if form not in ("13F-HR", "13F-HR/A"):
-            continue
         filing_date = row["filing_date"]
         report_date = row["report_date"] or estimate_report_date_from_filing(filing_date)
         if not report_date or not filing_date:
@@ -229,48 +268,104 @@ def choose_quarter_filings(rows: list[dict]) -> list[dict]:
         if report_dt < MIN_REPORT_DATE:
             continue
 
-        quarter = quarter_from_date(report_date)
-        copied = dict(row)
-        copied["quarter"] = quarter
-        copied["report_date"] = report_date
-        selected.append(copied)
+        # Rows come fresh from collect_submission_rows, so annotate them in place.
+        row["quarter"] = quarter_from_date(report_date)
+        row["report_date"] = report_date
+        selected.append(row)
 
     selected.sort(key=lambda x: (x["report_date"], x["filing_date"], x["accession"]))
     return selected
 
 
+def parse_share_count(text: str) -> int | None:
+    # Share counts are plain integers in practice; int() handles those (and
+    # surrounding whitespace) without the float round-trip, which is only kept
+    # for "1.0E3"-style values. Thousands separators are stripped on the slow path.
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    text = text.replace(",", "")
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return int(float(text))
+    except ValueError:
+        return None
+
+
+def finalize_holdings(aggregated: dict[str, dict], total_value: int) -> list[dict]:
+    # total_value is accumulated by the parsers while aggregating, so only the
+    # sort and the weight assignment walk the rows here.
+    holdings = sorted(aggregated.values(), key=itemgetter("value_usd"), reverse=True)
+    if total_value > 0:
+        for h in holdings:
+            h["weight"] = h["value_usd"] / total_value
+    else:
+        for h in holdings:
+            h["weight"] = 0
+    return holdings
+
+
 def parse_info_table_xml(xml_bytes: bytes) -> list[dict]:
-    root = ET.fromstring(xml_bytes)
+    events = ET.iterparse(io.BytesIO(xml_bytes), events=("start", "end"))
+    _, root = next(events)
     if not root.tag.lower().endswith("informationtable"):
+        # Finish the parse so malformed documents still raise ParseError.
+        for _ in events:
+            pass
         return []
 
     ns = ""
     if root.tag.startswith("{"):
         ns = root.tag.split("}")[0] + "}"
 
+    tag_info_table = f"{ns}infoTable"
+    tag_issuer = f"{ns}nameOfIssuer"
+    tag_cusip = f"{ns}cusip"
+    tag_value = f"{ns}value"
+    tag_title = f"{ns}titleOfClass"
+    tag_amount = f"{ns}shrsOrPrnAmt"
+    tag_shares = f"{ns}sshPrnamt"
+
     aggregated: dict[str, dict] = {}
-    for item in root.findall(f"{ns}infoTable"):
-        issuer = (item.findtext(f"{ns}nameOfIssuer") or "").strip()
-        cusip = (item.findtext(f"{ns}cusip") or "").strip()
-        value_txt = (item.findtext(f"{ns}value") or "0").replace(",", "").strip()
-        title_of_class = (item.findtext(f"{ns}titleOfClass") or "").strip()
-        shares_txt = (item.findtext(f"{ns}shrsOrPrnAmt/{ns}sshPrnamt") or "").replace(",", "").strip()
+    total_value = 0
+    depth = 1
+    for event, item in events:
+        if event == "start":
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 1 or item.tag != tag_info_table:
+            continue
+        issuer = (item.findtext(tag_issuer) or "").strip()
+        cusip = (item.findtext(tag_cusip) or "").strip()
+        value_txt = item.findtext(tag_value) or "0"
+        title_of_class = (item.findtext(tag_title) or "").strip()
+        # Two single-tag lookups stay in C; an "a/b" path goes through ElementPath.
+        amount = item.find(tag_amount)
+        shares_txt = (amount.findtext(tag_shares) if amount is not None else None) or ""
+        # Drop finished rows so only the current infoTable stays resident.
+        root.clear()
         code = cusip or issuer
         if not code:
             continue
+        # int() already ignores surrounding whitespace, so only values with
+        # thousands separators pay for the cleanup copy.
         try:
             value_usd = int(value_txt)
         except ValueError:
-            continue
-        shares = None
-        if shares_txt:
             try:
-                shares = int(float(shares_txt))
+                value_usd = int(value_txt.replace(",", ""))
             except ValueError:
-                shares = None
+                continue
+        shares = parse_share_count(shares_txt) if shares_txt else None
 
-        if code not in aggregated:
-            aggregated[code] = {
+        entry = aggregated.get(code)
+        if entry is None:
+            entry = aggregated[code] = {
                 "code": code,
                 "cusip": cusip,
                 "issuer": issuer,
@@ -278,18 +373,52 @@ def parse_info_table_xml(xml_bytes: bytes) -> list[dict]:
                 "value_usd": 0,
                 "shares": 0 if shares is not None else None,
             }
-        aggregated[code]["value_usd"] += value_usd
+        entry["value_usd"] += value_usd
+        total_value += value_usd
         if shares is not None:
-            if aggregated[code]["shares"] is None:
-                aggregated[code]["shares"] = 0
-            aggregated[code]["shares"] += shares
-
-    holdings = list(aggregated.values())
-    holdings.sort(key=lambda x: x["value_usd"], reverse=True)
-    total_value = sum(x["value_usd"] for x in holdings)
-    for h in holdings:
-        h["weight"] = (h["value_usd"] / total_value) if total_value > 0 else 0
-    return holdings
+            entry["shares"] = (entry["shares"] or 0) + shares
+
+    return finalize_holdings(aggregated, total_value)
+
+
+LEGACY_CLASS_SUFFIXES = (
+    "SPONSORED ADR",
+    "SPON ADR",
+    "CL A",
+    "CL B",
+    "CL C",
+    "CL D",
+    "CLASS A",
+    "CLASS B",
+    "CLASS C",
+    "CLASS D",
+    "PREF SHS",
+    "PFD",
+    "ADR",
+    "COM",
+    "ORD",
+    "UNIT",
+    "SHS",
+    "NOTE",
+)
+LEGACY_CLASS_SUFFIX_SET = frozenset(LEGACY_CLASS_SUFFIXES)
+LEGACY_CLASS_SUFFIX_MAX_TOKENS = max(len(suffix.split()) for suffix in LEGACY_CLASS_SUFFIXES)
+LEGACY_HEADER_PREFIXES = (
+    "NAME OF ISSUER",
+    "VOTING AUTHORITY",
+    "MARKET VALUE",
+    "SHARES OR",
+    "REPORT SUMMARY",
+    "LIST OF OTHER INCLUDED MANAGERS",
+    "COLUMN ",
+)
+_LEGACY_TABLE_RE = re.compile(r"<TABLE>(.*?)</TABLE>", re.IGNORECASE | re.DOTALL)
+_LEGACY_RULE_RE = re.compile(r"[-=*_\s]+")
+_LEGACY_SPLIT_CUSIP_RE = re.compile(r"\b([0-9A-Z]{6})\s+([0-9A-Z]{2})\s+([0-9A-Z])\b")
+_LEGACY_FULL_ROW_RE = re.compile(
+    r"^(?P<prefix>.+?)\s+(?P<cusip>[0-9A-Z]{9})\s+\$?\s*(?P<value>[0-9,]+)\s+(?P<shares>[0-9,]+)\b"
+)
+_LEGACY_CONTINUATION_RE = re.compile(r"^\$?\s*(?P<value>[0-9,]+)\s+(?P<shares>[0-9,]+)\b")
 
 
 def split_issuer_and_class(prefix: str) -> tuple[str, str]:
@@ -297,50 +426,40 @@ def split_issuer_and_class(prefix: str) -> tuple[str, str]:
     if not text:
         return "", ""
 
-    class_suffixes = [
-        "SPONSORED ADR",
-        "SPON ADR",
-        "CL A",
-        "CL B",
-        "CL C",
-        "CL D",
-        "CLASS A",
-        "CLASS B",
-        "CLASS C",
-        "CLASS D",
-        "PREF SHS",
-        "PFD",
-        "ADR",
-        "COM",
-        "ORD",
-        "UNIT",
-        "SHS",
-        "NOTE",
-    ]
-    upper = text.upper()
-    for suffix in class_suffixes:
-        if upper.endswith(f" {suffix}") or upper == suffix:
-            title = suffix
+    # text is single-spaced, so a suffix match is a match on its last tokens;
+    # longer tails go first so "SPONSORED ADR" beats "ADR" as before.
+    tokens = text.upper().rsplit(" ", LEGACY_CLASS_SUFFIX_MAX_TOKENS)
+    for size in range(min(LEGACY_CLASS_SUFFIX_MAX_TOKENS, len(tokens)), 0, -1):
+        suffix = " ".join(tokens[-size:])
+        if suffix in LEGACY_CLASS_SUFFIX_SET:
             issuer = text[: -len(suffix)].strip()
             if not issuer:
                 issuer = text
-            return issuer, title
+            return issuer, suffix
     return text, ""
 
 
+@lru_cache(maxsize=8192)
+def split_legacy_prefix(prefix: str) -> tuple[str, str]:
+    # Legacy tables repeat the same issuer prefix on many rows.
+    clean_prefix = " ".join((prefix or "").replace(".", " ").split()).strip()
+    return split_issuer_and_class(clean_prefix)
+
+
 def parse_info_table_legacy(raw_bytes: bytes) -> list[dict]:
     text = raw_bytes.decode("utf-8", "ignore")
-    table_blocks = re.findall(r"<TABLE>(.*?)</TABLE>", text, flags=re.IGNORECASE | re.DOTALL)
+    table_blocks = _LEGACY_TABLE_RE.findall(text)
     if not table_blocks:
         upper = text.upper()
         if "NAME OF ISSUER" in upper and "CUSIP" in upper:
             table_blocks = [text]
 
     aggregated: dict[str, dict] = {}
+    total_value = 0
 
     def add_row(prefix: str, cusip: str, value_str: str, shares_str: str) -> None:
-        clean_prefix = " ".join((prefix or "").replace(".", " ").split()).strip()
-        issuer, title_of_class = split_issuer_and_class(clean_prefix)
+        nonlocal total_value
+        issuer, title_of_class = split_legacy_prefix(prefix)
         code = (cusip or issuer or "").strip()
         if not code:
             return
@@ -348,14 +467,11 @@ def parse_info_table_legacy(raw_bytes: bytes) -> list[dict]:
             value_usd = int(value_str.replace(",", ""))
         except ValueError:
             return
-        shares = None
-        try:
-            shares = int(float(shares_str.replace(",", "")))
-        except ValueError:
-            shares = None
+        shares = parse_share_count(shares_str)
 
-        if code not in aggregated:
-            aggregated[code] = {
+        entry = aggregated.get(code)
+        if entry is None:
+            entry = aggregated[code] = {
                 "code": code,
                 "cusip": cusip,
                 "issuer": issuer or code,
@@ -363,16 +479,10 @@ def parse_info_table_legacy(raw_bytes: bytes) -> list[dict]:
                 "value_usd": 0,
                 "shares": 0 if shares is not None else None,
             }
-        aggregated[code]["value_usd"] += value_usd
+        entry["value_usd"] += value_usd
+        total_value += value_usd
         if shares is not None:
-            if aggregated[code]["shares"] is None:
-                aggregated[code]["shares"] = 0
-            aggregated[code]["shares"] += shares
-
-    full_row_pattern = re.compile(
-        r"^(?P<prefix>.+?)\s+(?P<cusip>[0-9A-Z]{9})\s+\$?\s*(?P<value>[0-9,]+)\s+(?P<shares>[0-9,]+)\b"
-    )
-    continuation_pattern = re.compile(r"^\$?\s*(?P<value>[0-9,]+)\s+(?P<shares>[0-9,]+)\b")
+            entry["shares"] = (entry["shares"] or 0) + shares
 
     for block in table_blocks:
         pending_name_parts: list[str] = []
@@ -382,33 +492,23 @@ def parse_info_table_legacy(raw_bytes: bytes) -> list[dict]:
             line = raw_line.strip()
             if not line:
                 continue
-            upper = line.upper()
             if line.startswith("<"):
                 continue
-            if upper.startswith("NAME OF ISSUER") or upper.startswith("VOTING AUTHORITY"):
-                pending_name_parts = []
-                continue
-            if upper.startswith("MARKET VALUE") or upper.startswith("SHARES OR"):
-                pending_name_parts = []
-                continue
-            if upper.startswith("<S>") or upper.startswith("REPORT SUMMARY"):
-                pending_name_parts = []
-                continue
-            if upper.startswith("LIST OF OTHER INCLUDED MANAGERS"):
-                pending_name_parts = []
-                continue
-            if upper.startswith("COLUMN "):
-                pending_name_parts = []
-                continue
-            if "INVESTMENT" in upper and "DISCRETION" in upper:
-                pending_name_parts = []
-                continue
-            if re.fullmatch(r"[-=*_\s]+", line):
+            upper = line.upper()
+            if (
+                upper.startswith(LEGACY_HEADER_PREFIXES)
+                or ("INVESTMENT" in upper and "DISCRETION" in upper)
+                or _LEGACY_RULE_RE.fullmatch(line)
+            ):
                 pending_name_parts = []
                 continue
 
-            normalized_line = re.sub(r"\b([0-9A-Z]{6})\s+([0-9A-Z]{2})\s+([0-9A-Z])\b", r"\1\2\3", line.upper())
-            full_match = full_row_pattern.match(normalized_line)
+            # Most rows carry an unsplit CUSIP; search() is about half the cost of a
+            # no-op sub(), which also has to expand the replacement template.
+            normalized_line = upper
+            if _LEGACY_SPLIT_CUSIP_RE.search(upper):
+                normalized_line = _LEGACY_SPLIT_CUSIP_RE.sub(r"\1\2\3", upper)
+            full_match = _LEGACY_FULL_ROW_RE.match(normalized_line)
             if full_match:
                 combined_prefix = " ".join(
                     part for part in [*pending_name_parts, full_match.group("prefix")] if part
@@ -421,22 +521,19 @@ def parse_info_table_legacy(raw_bytes: bytes) -> list[dict]:
                 pending_name_parts = []
                 continue
 
-            cont_match = continuation_pattern.match(normalized_line)
-            if cont_match and current_security:
+            cont_match = current_security and _LEGACY_CONTINUATION_RE.match(normalized_line)
+            if cont_match:
                 add_row(current_security[0], current_security[1], cont_match.group("value"), cont_match.group("shares"))
                 continue
 
             pending_name_parts.append(line)
 
-    holdings = list(aggregated.values())
-    holdings.sort(key=lambda x: x["value_usd"], reverse=True)
-    total_value = sum(x["value_usd"] for x in holdings)
-    for h in holdings:
-        h["weight"] = (h["value_usd"] / total_value) if total_value > 0 else 0
-    return holdings
+    return finalize_holdings(aggregated, total_value)
 
 
-def load_holding_list(cik: int, accession: str) -> tuple[str, list[dict]]:
+def fetch_holding_list(cik: int, accession: str) -> tuple[str, list[dict], bool]:
+    # complete is False when any candidate document failed to fetch or parse,
+    # so the returned table may not be the best one in the filing.
     cik_nozero = str(cik)
     accession_nodash = accession.replace("-", "")
     index_url = f"https://www.sec.gov/Archives/edgar/data/{cik_nozero}/{accession_nodash}/index.json"
@@ -447,6 +544,7 @@ def load_holding_list(cik: int, accession: str) -> tuple[str, list[dict]]:
     best_xml_name = ""
     best_holdings: list[dict] = []
     best_score = (-1, -1)
+    complete = True
 
     for xml_name in xml_candidates:
         if xml_name.lower() == "primary_doc.xml":
@@ -456,6 +554,7 @@ def load_holding_list(cik: int, accession: str) -> tuple[str, list[dict]]:
             holdings = parse_info_table_xml(fetch_bytes(xml_url))
         except Exception:
             holdings = []
+            complete = False
         if not holdings:
             continue
         total_value = sum(h["value_usd"] for h in holdings)
@@ -466,7 +565,7 @@ def load_holding_list(cik: int, accession: str) -> tuple[str, list[dict]]:
             best_holdings = holdings
 
     if best_holdings:
-        return best_xml_name, best_holdings
+        return best_xml_name, best_holdings, complete
 
     text_candidates = [
         x.get("name", "")
@@ -481,6 +580,7 @@ def load_holding_list(cik: int, accession: str) -> tuple[str, list[dict]]:
             holdings = parse_info_table_legacy(fetch_bytes(text_url))
         except Exception:
             holdings = []
+            complete = False
         if not holdings:
             continue
         total_value = sum(h["value_usd"] for h in holdings)
@@ -490,7 +590,40 @@ def load_holding_list(cik: int, accession: str) -> tuple[str, list[dict]]:
             best_xml_name = text_name
             best_holdings = holdings
 
-    return best_xml_name, best_holdings
+    return best_xml_name, best_holdings, complete
+
+
+def load_holding_list(cik: int, accession: str) -> tuple[str, list[dict]]:
+    if not SEC_CACHE_ENABLED:
+        xml_name, holdings, _ = fetch_holding_list(cik, accession)
+        return xml_name, holdings
+
+    cache_path = HOLDINGS_CACHE_DIR / str(cik) / f"{accession}.json"
+    # FORCE_REFRESH re-parses every filing and overwrites its cache entry.
+    if not FORCE_REFRESH:
+        try:
+            cached = json.loads(cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            cached = None
+        if isinstance(cached, dict) and cached.get("version") == HOLDINGS_CACHE_VERSION:
+            return cached.get("xml_name", ""), cached.get("holdings", [])
+
+    xml_name, holdings, complete = fetch_holding_list(cik, accession)
+    # Empty or partial results may come from a transient fetch failure; only
+    # cache parses where every candidate document was read.
+    if holdings and complete:
+        entry = {
+            "version": HOLDINGS_CACHE_VERSION,
+            "xml_name": xml_name,
+            "holdings": holdings,
+            "parsed_at_utc": dt.datetime.now(dt.timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z"),
+        }
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            write_atomic(cache_path, json.dumps(entry, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        except OSError:
+            pass
+    return xml_name, holdings
 
 
 def manager_ciks(manager_def: dict) -> list[int]:
@@ -509,7 +642,7 @@ def manager_ciks(manager_def: dict) -> list[int]:
 def build_filing_payload(cik: int, row: dict) -> dict:
     xml_name, holdings = load_holding_list(cik, row["accession"])
     total_value = sum(h["value_usd"] for h in holdings)
-    accession_nodash = row["accession"].replace("-", "")
+    filing_dir_url = f"https://www.sec.gov/Archives/edgar/data/{cik}/{row['accession'].replace('-', '')}/"
     return {
         "quarter": row["quarter"],
         "report_date": row["report_date"],
@@ -519,18 +652,22 @@ def build_filing_payload(cik: int, row: dict) -> dict:
         "primary_doc": row["primary_doc"],
         "source_cik": f"{cik:010d}",
         "info_table_file": xml_name,
-        "filing_url": f"https://www.sec.gov/Archives/edgar/data/{cik}/{accession_nodash}/{row['primary_doc']}",
-        "info_table_url": (
-            f"https://www.sec.gov/Archives/edgar/data/{cik}/{accession_nodash}/{xml_name}"
-            if xml_name
-            else ""
-        ),
+        "filing_url": filing_dir_url + row["primary_doc"],
+        "info_table_url": filing_dir_url + xml_name if xml_name else "",
         "holdings_count": len(holdings),
         "total_value_usd": total_value,
         "holdings": holdings,
     }
 
 
+def is_amendment(filing: dict) -> bool:
+    return (filing.get("form") or "").upper().endswith("/A")
+
+
+def has_positive_payload(filing: dict) -> bool:
+    return (filing.get("total_value_usd") or 0) > 0 or (filing.get("holdings_count") or 0) > 0
+
+
 def choose_best_by_quarter(filings: list[dict]) -> list[dict]:
     grouped: dict[str, list[dict]] = {}
     for filing in filings:
@@ -540,12 +677,9 @@ def choose_best_by_quarter(filings: list[dict]) -> list[dict]:
 
     by_quarter: dict[str, dict] = {}
 
-    def has_positive_payload(filing: dict) -> bool:
-        return (filing.get("total_value_usd") or 0) > 0 or (filing.get("holdings_count") or 0) > 0
-
     for quarter, quarter_filings in grouped.items():
         base_rows = [row for row in quarter_filings if (row.get("form") or "").upper() == "13F-HR"]
-        amend_rows = [row for row in quarter_filings if (row.get("form") or "").upper().endswith("/A")]
+        amend_rows = [row for row in quarter_filings if is_amendment(row)]
 
         candidates = quarter_filings
         if base_rows:
@@ -575,14 +709,10 @@ def choose_best_by_quarter(filings: list[dict]) -> list[dict]:
                 best_filing = filing
 
         if best_filing:
-            copied = dict(best_filing)
-            copied["_score"] = best_score
-            by_quarter[quarter] = copied
+            by_quarter[quarter] = best_filing
 
     selected = list(by_quarter.values())
     selected.sort(key=lambda x: x["report_date"])
-    for row in selected:
-        row.pop("_score", None)
     return selected
 
 
@@ -620,13 +750,8 @@ def index_existing_filings(existing_manager: dict | None) -> tuple[dict[tuple[in
     return by_key, by_cik
 
 
-def load_existing_history_managers() -> dict[str, dict]:
-    if not OUTPUT_PATH.exists():
-        return {}
-    try:
-        payload = json.loads(OUTPUT_PATH.read_text(encoding="utf-8"))
-    except Exception as exc:
-        print(f"[warn] existing history parse failed: {exc}")
+def load_existing_history_managers(payload: dict | None) -> dict[str, dict]:
+    if not isinstance(payload, dict):
         return {}
 
     result: dict[str, dict] = {}
@@ -665,15 +790,18 @@ def build_manager_payload(manager_def: dict, existing_manager: dict | None = Non
     fetched_count = 0
     reused_count = len(all_payload_rows)
     failed_ciks: list[tuple[int, Exception]] = []
+    # A joint filing can be listed under several of a manager's CIKs; fetch
+    # each accession once, whichever CIK reaches it first, and keep the other
+    # CIKs as fallbacks in case that fetch fails or comes back empty.
+    queued_accessions = {accession for _, accession in existing_by_key}
+    pending_rows: list[tuple[int, dict]] = []
+    alternate_rows: dict[str, list[tuple[int, dict]]] = {}
 
     for idx, cik in enumerate(ciks, start=1):
         print(f"    - [{idx}/{total_ciks}] CIK {cik:010d}")
         cached_rows_for_cik = existing_by_cik.get(cik, [])
-        known_accessions = {
-            (row.get("accession") or "").strip()
-            for row in cached_rows_for_cik
-            if (row.get("accession") or "").strip()
-        }
+        # index_existing_filings only keeps rows with a non-empty accession.
+        known_accessions = {row["accession"].strip() for row in cached_rows_for_cik}
         load_full_history = len(cached_rows_for_cik) == 0
 
         try:
@@ -719,11 +847,59 @@ def build_manager_payload(manager_def: dict, existing_manager: dict | None = Non
 
         candidate_count += len(candidate_rows)
         for row in candidate_rows:
+            if row["accession"] in queued_accessions:
+                alternate_rows.setdefault(row["accession"], []).append((cik, row))
+                continue
+            queued_accessions.add(row["accession"])
+            pending_rows.append((cik, row))
+
+    def fetch_filing(cik: int, row: dict) -> dict:
+        payload = None
+        last_exc: Exception | None = None
+        for source_cik, source_row in [(cik, row), *alternate_rows.get(row["accession"], [])]:
             try:
-                all_payload_rows.append(build_filing_payload(cik, row))
-                fetched_count += 1
+                payload = build_filing_payload(source_cik, source_row)
             except Exception as exc:
-                print(f"    - [warn] filing fetch failed {cik:010d} {row['accession']}: {exc}")
+                last_exc = exc
+                continue
+            if has_positive_payload(payload):
+                break
+        if payload is None:
+            raise last_exc
+        return payload
+
+    def fetch_pending(rows: list[tuple[int, dict]]) -> None:
+        nonlocal fetched_count
+        # Filings from every CIK share one pool; sec_http's shared throttle keeps
+        # the request start rate at min_interval_seconds across all workers.
+        with ThreadPoolExecutor(max_workers=FILING_FETCH_WORKERS) as executor:
+            futures = [executor.submit(fetch_filing, cik, row) for cik, row in rows]
+            for (cik, row), future in zip(rows, futures):
+                try:
+                    all_payload_rows.append(future.result())
+                    fetched_count += 1
+                except Exception as exc:
+                    print(f"    - [warn] filing fetch failed {cik:010d} {row['accession']}: {exc}")
+
+    # choose_best_by_quarter ignores amendments whenever a quarter has an
+    # original 13F-HR with holdings, so only fetch amendments for quarters
+    # the originals did not settle.
+    fetch_pending([item for item in pending_rows if not is_amendment(item[1])])
+    settled_quarters = {
+        filing.get("quarter")
+        for filing in all_payload_rows
+        if (filing.get("form") or "").upper() == "13F-HR" and has_positive_payload(filing)
+    }
+    skipped_amendments = 0
+    open_amendments: list[tuple[int, dict]] = []
+    for item in pending_rows:
+        if not is_amendment(item[1]):
+            continue
+        if item[1]["quarter"] in settled_quarters:
+            skipped_amendments += 1
+        else:
+            open_amendments.append(item)
+    fetch_pending(open_amendments)
 
     for failed_cik, failed_exc in failed_ciks:
         cached_rows = existing_by_cik.get(failed_cik, [])
@@ -742,9 +918,9 @@ def build_manager_payload(manager_def: dict, existing_manager: dict | None = Non
         if cached_entity_name:
             entity_names.append(cached_entity_name)
 
-    unique_entity_names = [name for name in dict.fromkeys(entity_names) if name]
+    unique_entity_names = list(dict.fromkeys(name for name in entity_names if name))
     print(
-        f"    - [stats] discovered={discovered_count} candidates={candidate_count} fetched={fetched_count} reused={reused_count} selected={len(filing_payloads)}"
+        f"    - [stats] discovered={discovered_count} candidates={candidate_count} fetched={fetched_count} reused={reused_count} skipped_amendments={skipped_amendments} selected={len(filing_payloads)}"
     )
 
     return {
@@ -768,7 +944,6 @@ def main() -> None:
     else:
         manager_defs = MANAGERS
 
-    existing_by_id = load_existing_history_managers()
     existing_payload_obj: dict | None = None
     existing_raw_text = ""
     if OUTPUT_PATH.exists():
@@ -776,7 +951,10 @@ def main() -> None:
             existing_raw_text = OUTPUT_PATH.read_text(encoding="utf-8")
             existing_payload_obj = json.loads(existing_raw_text)
         except Exception as exc:
-            print(f"[warn] failed to parse existing payload for diff check: {exc}")
+            print(f"[warn] existing history parse failed: {exc}")
+    existing_by_id = load_existing_history_managers(existing_payload_obj)
+    if FORCE_REFRESH:
+        print("FORCE_REFRESH=1: rebuilding every filing; cached managers are only used as a fallback.")
 
     managers = []
     total = len(manager_defs)
@@ -791,7 +969,10 @@ def main() -> None:
         print(f"[{idx}/{total}] Fetching {manager_def['org']} ({cik_desc}) ...")
         existing_manager = existing_by_id.get(manager_def["id"])
         try:
-            payload = build_manager_payload(manager_def, existing_manager=existing_manager)
+            payload = build_manager_payload(
+                manager_def,
+                existing_manager=None if FORCE_REFRESH else existing_manager,
+            )
             refreshed_managers += 1
         except Exception as exc:
             if isinstance(existing_manager, dict) and existing_manager.get("filings"):
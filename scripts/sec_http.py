@@ -1,19 +1,39 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
+import base64
 import datetime as dt
+import gzip
+import hashlib
+import http.client
+import io
+import json
 import os
+import pathlib
+import random
 import re
+import threading
 import time
 import urllib.error
+import urllib.parse
 import urllib.request
+import zlib
+from email.message import Message
 from email.utils import parsedate_to_datetime
+from functools import lru_cache
 from typing import Callable
 
 
 _CONTACT_EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+_UA_PARENS_RE = re.compile(r"[\(\)]")
+_UA_CONTACT_LABEL_RE = re.compile(r"\bcontact\s*:\s*", re.IGNORECASE)
+_UA_WHITESPACE_RE = re.compile(r"\s+")
 _LAST_REQUEST_TS = 0.0
+_THROTTLE_LOCK = threading.Lock()
 _UA_WARNED = False
+_CONNECTIONS = threading.local()
+_PACING = threading.local()
+_MAX_REDIRECTS = 5
 
 DEFAULT_CONTACT_EMAIL = os.environ.get("SEC_CONTACT_EMAIL", "maintainer@example.com").strip() or "maintainer@example.com"
 DEFAULT_USER_AGENT_PRODUCT = "13F-Tracker-AutoUpdate/1.0"
@@ -25,12 +45,13 @@ def _extract_contact_email(user_agent: str) -> str | None:
     return match.group(0) if match else None
 
 
-def _build_headers(user_agent: str, accept: str) -> dict[str, str]:
+@lru_cache(maxsize=16)
+def _static_headers(user_agent: str, accept: str) -> tuple[tuple[str, str], ...]:
     headers = {
         "User-Agent": user_agent,
         "Accept": accept,
         "Accept-Language": "en-US,en;q=0.8",
-        "Accept-Encoding": "identity",
+        "Accept-Encoding": "gzip",
         "Referer": "https://www.sec.gov/",
         "Connection": "keep-alive",
         "Cache-Control": "no-cache",
@@ -38,7 +59,12 @@ def _build_headers(user_agent: str, accept: str) -> dict[str, str]:
     contact_email = _extract_contact_email(user_agent)
     if contact_email:
         headers["From"] = contact_email
-    return headers
+    return tuple(headers.items())
+
+
+def _build_headers(user_agent: str, accept: str) -> dict[str, str]:
+    # Fresh dict per attempt: callers layer extra_headers on top of it.
+    return dict(_static_headers(user_agent, accept))
 
 
 def _is_blocked_contact_email(email: str | None) -> bool:
@@ -48,6 +74,7 @@ def _is_blocked_contact_email(email: str | None) -> bool:
     return any(domain.endswith(suffix) for suffix in BLOCKED_EMAIL_DOMAIN_SUFFIXES)
 
 
+@lru_cache(maxsize=16)
 def normalize_user_agent(raw_user_agent: str) -> tuple[str, str | None]:
     compact = " ".join((raw_user_agent or "").split()).strip()
     if not compact:
@@ -60,9 +87,9 @@ def normalize_user_agent(raw_user_agent: str) -> tuple[str, str | None]:
     base = compact
     if contact_email:
         base = base.replace(contact_email, " ")
-    base = re.sub(r"[\(\)]", " ", base)
-    base = re.sub(r"\bcontact\s*:\s*", " ", base, flags=re.IGNORECASE)
-    base = re.sub(r"\s+", " ", base).strip()
+    base = _UA_PARENS_RE.sub(" ", base)
+    base = _UA_CONTACT_LABEL_RE.sub(" ", base)
+    base = _UA_WHITESPACE_RE.sub(" ", base).strip()
     if not base:
         base = DEFAULT_USER_AGENT_PRODUCT
 
@@ -94,8 +121,7 @@ def _parse_retry_after_seconds(raw_value: str | None) -> float | None:
 
     if target.tzinfo is None:
         target = target.replace(tzinfo=dt.timezone.utc)
-    now = dt.datetime.now(dt.timezone.utc)
-    return max(0.0, (target - now).total_seconds())
+    return max(0.0, target.timestamp() - time.time())
 
 
 def _compute_wait_seconds(attempt: int, http_code: int | None, retry_after_seconds: float | None) -> float:
@@ -103,7 +129,10 @@ def _compute_wait_seconds(attempt: int, http_code: int | None, retry_after_secon
         base = 4.0 + (attempt * 4.0)
     else:
         base = 1.5 * attempt
-    wait_seconds = min(45.0, base)
+    # Jitter the backoff so concurrent workers that hit the same 403/429 do
+    # not all retry in the same instant; the lower half keeps a minimum wait.
+    ceiling = min(45.0, base)
+    wait_seconds = random.uniform(ceiling * 0.5, ceiling)
     if retry_after_seconds is not None:
         wait_seconds = max(wait_seconds, min(60.0, retry_after_seconds))
     return wait_seconds
@@ -112,24 +141,149 @@ def _compute_wait_seconds(attempt: int, http_code: int | None, retry_after_secon
 def _throttle(min_interval_seconds: float) -> None:
     global _LAST_REQUEST_TS
 
-    now = time.monotonic()
-    gap = (_LAST_REQUEST_TS + min_interval_seconds) - now
+    # Reserve the next send slot under the lock, then sleep outside it, so
+    # concurrent callers queue up at min_interval_seconds apart. A thread's
+    # own post-success pause (see _defer_next_request) also bounds its slot.
+    not_before = getattr(_PACING, "not_before", 0.0)
+    with _THROTTLE_LOCK:
+        now = time.monotonic()
+        slot = max(now, not_before, _LAST_REQUEST_TS + min_interval_seconds)
+        _LAST_REQUEST_TS = slot
+    gap = slot - now
     if gap > 0:
         time.sleep(gap)
-    _LAST_REQUEST_TS = time.monotonic()
 
 
-def fetch_bytes(
+def _defer_next_request(pause_seconds: float) -> None:
+    # Rather than sleeping after a successful response, record when this
+    # thread may send again; the caller's parsing overlaps the pause.
+    _PACING.not_before = time.monotonic() + pause_seconds
+
+
+def _proxy_for(scheme: str, host: str) -> urllib.parse.SplitResult | None:
+    # Honour HTTP_PROXY/HTTPS_PROXY/NO_PROXY the same way urlopen does.
+    proxy = urllib.request.getproxies().get(scheme)
+    if not proxy or urllib.request.proxy_bypass(host):
+        return None
+    if "://" not in proxy:
+        proxy = f"http://{proxy}"
+    return urllib.parse.urlsplit(proxy)
+
+
+def _proxy_auth_headers(proxy: urllib.parse.SplitResult) -> dict[str, str]:
+    if not proxy.username:
+        return {}
+    credentials = f"{urllib.parse.unquote(proxy.username)}:{urllib.parse.unquote(proxy.password or '')}"
+    return {"Proxy-Authorization": "Basic " + base64.b64encode(credentials.encode("utf-8")).decode("ascii")}
+
+
+def _pooled_connection(
+    scheme: str,
+    host: str,
+    timeout: float,
+    proxy: urllib.parse.SplitResult | None = None,
+) -> tuple[http.client.HTTPConnection, bool]:
+    # One keep-alive connection per (scheme, host) per thread: http.client
+    # connections are not thread-safe, but each worker can reuse its own.
+    pool = getattr(_CONNECTIONS, "pool", None)
+    if pool is None:
+        pool = _CONNECTIONS.pool = {}
+    conn = pool.get((scheme, host))
+    if conn is not None:
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, True
+    conn_cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+    if proxy is None:
+        conn = conn_cls(host, timeout=timeout)
+    else:
+        conn = conn_cls(proxy.hostname, proxy.port, timeout=timeout)
+        if scheme == "https":
+            # HTTPS goes through a CONNECT tunnel; TLS is still end to end.
+            conn.set_tunnel(host, headers=_proxy_auth_headers(proxy))
+    pool[(scheme, host)] = conn
+    return conn, False
+
+
+def _drop_connection(scheme: str, host: str) -> None:
+    pool = getattr(_CONNECTIONS, "pool", {})
+    conn = pool.pop((scheme, host), None)
+    if conn is not None:
+        conn.close()
+
+
+def _is_stale_connection_error(exc: BaseException) -> bool:
+    # What a keep-alive socket the server already closed looks like on the
+    # next request. RemoteDisconnected is a ConnectionResetError subclass.
+    if isinstance(exc, (ConnectionResetError, BrokenPipeError)):
+        return True
+    # http.client stores an empty status line as its repr, "''".
+    return isinstance(exc, http.client.BadStatusLine) and exc.line in ("", "''")
+
+
+def _get_once(url: str, headers: dict[str, str], timeout: float) -> tuple[int, str, Message, bytes]:
+    parts = urllib.parse.urlsplit(url)
+    path = parts.path or "/"
+    if parts.query:
+        path = f"{path}?{parts.query}"
+    proxy = _proxy_for(parts.scheme, parts.netloc)
+    if proxy is not None and parts.scheme == "http":
+        # Plain-HTTP proxies take the absolute URL as the request target.
+        path = urllib.parse.urlunsplit(parts._replace(fragment=""))
+        headers = {**headers, **_proxy_auth_headers(proxy)}
+
+    while True:
+        conn, reused = _pooled_connection(parts.scheme, parts.netloc, timeout, proxy)
+        try:
+            conn.request("GET", path, headers=headers)
+            response = conn.getresponse()
+            body = response.read()
+        except (http.client.HTTPException, OSError) as exc:
+            _drop_connection(parts.scheme, parts.netloc)
+            # The server may have closed an idle keep-alive socket; retry once
+            # on a fresh connection before surfacing the error. Timeouts and
+            # other failures go back to fetch_response's throttled backoff.
+            if reused and _is_stale_connection_error(exc):
+                continue
+            raise
+        if response.will_close:
+            _drop_connection(parts.scheme, parts.netloc)
+        if body and response.headers.get("Content-Encoding", "").strip().lower() == "gzip":
+            try:
+                body = gzip.decompress(body)
+            except (OSError, EOFError, zlib.error) as exc:
+                # A truncated or corrupt body is a transport failure; surface it
+                # as one so fetch_response retries it.
+                raise http.client.HTTPException(f"invalid gzip body from {url}: {exc}") from exc
+        return response.status, response.reason, response.headers, body
+
+
+def _open(url: str, headers: dict[str, str], timeout: float) -> tuple[bytes, Message]:
+    for _ in range(_MAX_REDIRECTS + 1):
+        status, reason, response_headers, body = _get_once(url, headers, timeout)
+        location = response_headers.get("Location")
+        if status in (301, 302, 303, 307, 308) and location:
+            url = urllib.parse.urljoin(url, location)
+            continue
+        if 200 <= status < 300:
+            return body, response_headers
+        raise urllib.error.HTTPError(url, status, reason, response_headers, io.BytesIO(body))
+    raise urllib.error.URLError(f"too many redirects for {url}")
+
+
+def fetch_response(
     url: str,
     *,
     user_agent: str,
     accept: str = "application/json,text/xml,*/*",
+    extra_headers: dict[str, str] | None = None,
     timeout: float = 60,
     max_attempts: int = 10,
     min_interval_seconds: float = 0.65,
     success_pause_seconds: float = 0.2,
     logger: Callable[[str], None] | None = print,
-) -> bytes:
+) -> tuple[bytes, Message]:
     global _UA_WARNED
 
     normalized_user_agent, ua_warning = normalize_user_agent(user_agent)
@@ -139,19 +293,21 @@ def fetch_bytes(
         _UA_WARNED = True
 
     last_error: Exception | None = None
+    headers = _build_headers(normalized_user_agent, accept)
+    if extra_headers:
+        headers.update(extra_headers)
 
     for attempt in range(1, max_attempts + 1):
         _throttle(min_interval_seconds)
-        request = urllib.request.Request(url, headers=_build_headers(normalized_user_agent, accept))
         try:
-            with urllib.request.urlopen(request, timeout=timeout) as response:
-                data = response.read()
+            data, response_headers = _open(url, headers, timeout)
             if b"Request Rate Threshold Exceeded" in data:
                 raise RuntimeError("sec-rate-limit")
-            time.sleep(success_pause_seconds)
-            return data
+            _defer_next_request(success_pause_seconds)
+            return data, response_headers
         except urllib.error.HTTPError as exc:
-            if exc.code == 404:
+            # 304 answers a conditional request and 404 is final; neither is retryable.
+            if exc.code in (304, 404):
                 raise
 
             last_error = exc
@@ -170,7 +326,7 @@ def fetch_bytes(
                     detail += " (rate-limit)"
                 logger(f"[retry {attempt}/{max_attempts}] {url} -> {detail}; wait {wait_seconds:.1f}s")
             time.sleep(wait_seconds)
-        except (urllib.error.URLError, TimeoutError, RuntimeError) as exc:
+        except (OSError, http.client.HTTPException, RuntimeError) as exc:
             last_error = exc
             wait_seconds = _compute_wait_seconds(attempt, None, None)
             if logger is not None:
@@ -178,3 +334,79 @@ def fetch_bytes(
             time.sleep(wait_seconds)
 
     raise RuntimeError(f"Failed to fetch {url}: {last_error}")
+
+
+def fetch_bytes(url: str, **kwargs) -> bytes:
+    data, _ = fetch_response(url, **kwargs)
+    return data
+
+
+def write_atomic(path: pathlib.Path, data: bytes) -> None:
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def fetch_cached(
+    url: str,
+    *,
+    cache_dir: pathlib.Path,
+    immutable: bool = False,
+    refresh: bool = False,
+    **kwargs,
+) -> bytes:
+    """Fetch url through an on-disk cache of gzipped bodies plus ETag/Last-Modified.
+
+    Immutable URLs (filed EDGAR archives) are served from disk without a
+    request; everything else is revalidated with a conditional GET. With
+    refresh=True the cached copy is ignored and overwritten by a full GET.
+    """
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    # Shard by key prefix so a full history does not pile thousands of files
+    # into one directory.
+    shard_dir = cache_dir / key[:2]
+    body_path = shard_dir / f"{key}.gz"
+    meta_path = shard_dir / f"{key}.meta.json"
+
+    cached: bytes | None = None
+    if not refresh and body_path.exists():
+        try:
+            cached = gzip.decompress(body_path.read_bytes())
+        except (OSError, EOFError):
+            cached = None
+    if cached is not None and immutable:
+        return cached
+
+    validators: dict[str, str] = {}
+    if cached is not None:
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            meta = {}
+        if meta.get("etag"):
+            validators["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            validators["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        data, headers = fetch_response(url, extra_headers=validators, **kwargs)
+    except urllib.error.HTTPError as exc:
+        if exc.code == 304 and validators:
+            return cached
+        raise
+
+    try:
+        shard_dir.mkdir(parents=True, exist_ok=True)
+        # Body before validators: a crash in between leaves stale validators,
+        # which only costs a full re-download next time.
+        write_atomic(body_path, gzip.compress(data))
+        if not immutable:
+            meta = {
+                "url": url,
+                "etag": headers.get("ETag", ""),
+                "last_modified": headers.get("Last-Modified", ""),
+            }
+            write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+    except OSError:
+        pass
+    return data